@@ -28,8 +28,29 @@ SOFTWARE.
 # H.Chan
 import binascii
 import struct
+import math
+import time
+import threading
+import collections
+import bisect
+import heapq
+import mmap
 import sys
+import os
 import re
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+try:
+    from multiprocessing import shared_memory, resource_tracker
+except ImportError:
+    # Python < 3.8, MSCRing falls back to mmap on /dev/shm
+    shared_memory = None
 
 # Configurable Parameters
 MAX_NAME_LEN = 10
@@ -59,8 +80,106 @@ class Disp:
         '''
         pass
 
+    def Close(self):
+        ''' Flushes any pending output when the capture ends
+        '''
+        pass
+
+    def Record(self, ucPri, ucOpc, msgId):
+        ''' Receives the raw priority, opcode and message id (None if not applicable) of each parsed record
+        '''
+        pass
+
+    def Skipped(self, count, critical=0):
+        ''' Displays a marker for records that were skipped (i.e. shed under overload)
+        count[in] - Number of records skipped
+        critical[in] - How many of them were critical records lost (i.e. to MSCRing overruns)
+        '''
+        pass
+
+    def _SkipStr(self, count, critical):
+        ''' Private Function to return the text of the skipped records marker
+        '''
+        if critical:
+            return "skipped %d records (%d critical lost)" % (count, critical)
+        return "skipped %d records" % count
+
+
+class DispPaged(Disp):
+    ''' Default Display Class for text renderers that can split the output into pages
+    When maxLines is set each page is a complete diagram with its own header
+    (participants and continuation marker) and footer, and is streamed to stdout
+    or to its own file so memory stays flat regardless of the trace length.
+    Formats that can't hold several diagrams in one input (STREAM_PAGES = False)
+    must write each page to its own file.
+    '''
+    STREAM_PAGES = True
+
+    def _InitPages(self, maxLines, fileName, stdout):
+        ''' Private Function to initialize the paging state
+        maxLines[in] - Maximum lines per page before starting a new one (0: single page)
+        fileName[in] - Page file name pattern taking the page number (i.e. "msc_%03d.txt")
+        stdout[in] - Can be overwritten to a file or stdout, used when fileName is None
+        '''
+        if maxLines and fileName is None and not self.STREAM_PAGES:
+            raise ValueError("%s needs a fileName to split its output into pages" % self.__class__.__name__)
+        self.maxLines = maxLines
+        self.fileName = fileName
+        self.stdout = stdout if stdout is not None else sys.stdout
+        self.out = None if maxLines else self.stdout
+        self.page = 0
+        self.pageLines = 0
+
+    def _Header(self, isCont):
+        ''' Private Function returning the text that opens a page
+        '''
+        return ""
+
+    def _Footer(self, isCont):
+        ''' Private Function returning the text that closes a page
+        '''
+        return ""
 
-class DispPlantUML(Disp):
+    def _IsPageValid(self):
+        ''' Private Function returning False when the current page can't take more records
+        '''
+        return self.pageLines < self.maxLines
+
+    def _EndPage(self, isCont):
+        ''' Private Function to close the current page
+        '''
+        self.out.write(self._Footer(isCont))
+        if self.fileName is not None:
+            self.out.close()
+        self.out = None
+
+    def _NewPage(self):
+        ''' Private Function to close the current page and open the next one
+        '''
+        if self.out is not None:
+            self._EndPage(True)
+        self.page += 1
+        self.out = open(self.fileName % self.page, "w") if self.fileName is not None else self.stdout
+        self.out.write(self._Header(self.page > 1))
+        self.pageLines = 0
+
+    def _Write(self, text):
+        ''' Private Function to output a record, starting a new page when required
+        '''
+        if self.maxLines:
+            if self.out is None or not self._IsPageValid():
+                self._NewPage()
+            self.pageLines += text.count("\n")
+        self.out.write(text)
+
+    def Close(self):
+        ''' Closes the last page
+        '''
+        if self.maxLines and self.out is not None:
+            self._EndPage(False)
+
+
+class DispPlantUML(DispPaged):
     ''' Class providing API for displaying in https://www.plantuml.com/
     '''
     # These are the terminal escape codes for color
@@ -74,16 +193,30 @@ class DispPlantUML(Disp):
         "[#cyan]",    #MSC_COLOR_CYN
     ]
 
-    def __init__(self, linesPerPage=LINES_PER_PAGE, prefix="", stdout=None):
+    def __init__(self, linesPerPage=LINES_PER_PAGE, prefix="", stdout=None, maxLines=0, fileName=None):
         ''' Initialize the display
         linesPerPage[in] - Sets the number of rows before print(ng a new banner)
         prefix[in] - Prefix String or callable function to generate prefix string
         stdout[in] - Can be overwritten to a file or stdout
+        maxLines[in] - Maximum lines per @startuml/@enduml page (0: single unbounded diagram)
+        fileName[in] - Page file name pattern taking the page number (i.e. "msc_%03d.puml")
         '''
-        self.stdout = stdout if stdout is not None else sys.stdout
+        self._InitPages(maxLines, fileName, stdout)
         self.objList = []
         self.objCnt = len(self.objList)
 
+    def _Header(self, isCont):
+        header = "@startuml\n"
+        for obj in self.objList:
+            header += 'participant "%s"\n' % obj
+        if isCont:
+            header += "== continued from page %d ==\n" % (self.page - 1)
+        return header
+
+    def _Footer(self, isCont):
+        footer = "... continued on page %d ...\n" % (self.page + 1) if isCont else ""
+        return footer + "@enduml\n"
+
     def SetObjList(self, objList):
         '''
         '''
@@ -93,34 +226,38 @@ class DispPlantUML(Disp):
     def Message(self, srcId, dstId, msgStr, color=MSC_COLOR_NONE):
         ''' Displays a message line from the src to dst object's life line
         '''
-        self.stdout.write('"%s" -%s> "%s":%s\n' % (self.objList[srcId], DispPlantUML.COLOR[color], self.objList[dstId], msgStr))
+        self._Write('"%s" -%s> "%s":%s\n' % (self.objList[srcId], DispPlantUML.COLOR[color], self.objList[dstId], msgStr))
 
     def Event(self, objId, msgStr, color=MSC_COLOR_NONE):
         ''' Displays a asynchronous event to an object's life line
         '''
-        self.stdout.write('[-%s\\ "%s":%s\n' % (DispPlantUML.COLOR[color], self.objList[objId], msgStr))
+        self._Write('[-%s\\ "%s":%s\n' % (DispPlantUML.COLOR[color], self.objList[objId], msgStr))
 
     def State(self, objId, stateStr, color=MSC_COLOR_NONE):
         ''' Displays a state change in an object's life line
         '''
-        self.stdout.write('hnote over "%s":%s\n' % (self.objList[objId], stateStr))
+        self._Write('hnote over "%s":%s\n' % (self.objList[objId], stateStr))
 
     def Create(self, srcId, dstId, msgStr, color=MSC_COLOR_NONE):
         ''' Displays a message line from the src to created object's life line
         '''
-        self.stdout.write('create %s\n' % (self.objList[dstId]))
-        self.stdout.write('"%s" -%s> "%s":%s\n' % (self.objList[srcId], DispPlantUML.COLOR[color], self.objList[dstId], msgStr))
+        self._Write('create %s\n"%s" -%s> "%s":%s\n' % (self.objList[dstId], self.objList[srcId], DispPlantUML.COLOR[color], self.objList[dstId], msgStr))
 
     def Destroy(self, objId, color=MSC_COLOR_NONE):
         ''' Displays a destroy of an object's life line
         '''
-        self.stdout.write('destroy "%s"\n' % self.objList[objId])
+        self._Write('destroy "%s"\n' % self.objList[objId])
 
     def TestPt(self, objId, msgStr, color=MSC_COLOR_NONE):
-        self.stdout.write('note over "%s":%s\n' % (self.objList[objId], msgStr))
+        self._Write('note over "%s":%s\n' % (self.objList[objId], msgStr))
+
+    def Skipped(self, count, critical=0):
+        ''' Displays a delay marker for the skipped records
+        '''
+        self._Write('... %s ...\n' % self._SkipStr(count, critical))
 
 
-class DispMscgen(Disp):
+class DispMscgen(DispPaged):
     ''' Class providing API for displaying in https://www.plantuml.com/
     '''
     # These are the terminal escape codes for color
@@ -135,53 +272,112 @@ class DispMscgen(Disp):
         "#ffffff",    #MSC_COLOR_WHT
     ]
     ASYNC = "Async"
+    # mscgen accepts a single msc {} per input
+    STREAM_PAGES = False
 
-    def __init__(self, linesPerPage=LINES_PER_PAGE, prefix="", stdout=None):
+    def __init__(self, linesPerPage=LINES_PER_PAGE, prefix="", stdout=None, maxLines=0, fileName=None):
         ''' Initialize the display
         linesPerPage[in] - Sets the number of rows before print(ng a new banner)
         prefix[in] - Prefix String or callable function to generate prefix string
         stdout[in] - Can be overwritten to a file or stdout
+        maxLines[in] - Maximum lines per msc {} page (0: single chart with repeated banners)
+            mscgen needs every entity declared up front, so each page is buffered
+            (at most maxLines lines) and written once it is full
+        fileName[in] - Page file name pattern taking the page number (i.e. "msc_%03d.msc"),
+            required with maxLines
         '''
         self.lines = 0
         self.linesPerPage = linesPerPage
-        self.stdout = stdout if stdout is not None else sys.stdout
+        self._InitPages(maxLines, fileName, stdout)
         self.objList = []
         self.objCnt = len(self.objList)
+        self.pageBuf = []
+        self.pageObjs = []
+
+    def _GetBanner(self, objList):
+        ''' Private Function to return the entity declaration for the objList
+        '''
+        #NOTE: There is no real async event support for mscgen, so add an async event proxy
+        banner = '"%s"' % self.ASYNC
+        # Add objects as listed
+        for obj in objList:
+            banner += ', "%s"' % obj
+        return banner + ";\n"
+
+    def _Header(self, isCont):
+        # Declare every entity used on the page, including those destroyed on it
+        header = "msc {\n" + self._GetBanner(self.pageObjs)
+        if isCont:
+            header += '--- [label="continued from page %d"];\n' % (self.page - 1)
+        return header
+
+    def _Footer(self, isCont):
+        footer = '--- [label="continued on page %d"];\n' % (self.page + 1) if isCont else ""
+        return footer + "}\n"
+
+    def _FlushPage(self, isCont):
+        ''' Private Function to write the buffered page with its header and footer
+        '''
+        self.page += 1
+        self.out = open(self.fileName % self.page, "w") if self.fileName is not None else self.stdout
+        self.out.write(self._Header(self.page > 1))
+        self.out.write("".join(self.pageBuf))
+        self._EndPage(isCont)
+        self.pageBuf = []
+        self.pageObjs = list(self.objList)
+        self.pageLines = 0
+
+    def _Write(self, text):
+        if not self.maxLines:
+            DispPaged._Write(self, text)
+            return
+        if self.pageLines >= self.maxLines:
+            self._FlushPage(True)
+        self.pageBuf.append(text)
+        self.pageLines += text.count("\n")
+
+    def Close(self):
+        ''' Writes the last buffered page
+        '''
+        if self.maxLines and self.pageBuf:
+            self._FlushPage(False)
 
     def SetObjList(self, objList):
         '''
         '''
         self.objList = objList
         self.objCnt = len(self.objList)
+        # Remember the entities the current page needs to declare
+        for obj in objList:
+            if obj not in self.pageObjs:
+                self.pageObjs.append(obj)
 
     def Banner(self, isRequired=False):
         ''' Displays the object banner after a number of lines or when the objList changes
         '''
+        if self.maxLines:
+            # Each page declares its own entities in the header
+            return
         if (self.lines % self.linesPerPage == 0) or isRequired:
-            #NOTE: There is no real async event support for mscgen, so add an async event proxy
-            banner = '"%s"' % self.ASYNC
-            # Add objects as listed
-            for obj in self.objList:
-                banner += ', "%s"' % obj
-            self.stdout.write(banner + ";\n")
+            self._Write(self._GetBanner(self.objList))
             self.lines = 0
         self.lines += 1
 
     def Message(self, srcId, dstId, msgStr, color=MSC_COLOR_NONE):
         ''' Displays a message line from the src to dst object's life line
         '''
-        self.stdout.write('"%s"=>>"%s" [label="%s", linecolor="%s"];\n' % (self.objList[srcId], self.objList[dstId], msgStr, self.COLOR[color]))
+        self._Write('"%s"=>>"%s" [label="%s", linecolor="%s"];\n' % (self.objList[srcId], self.objList[dstId], msgStr, self.COLOR[color]))
 
     def Event(self, objId, msgStr, color=MSC_COLOR_NONE):
         ''' Displays a asynchronous event to an object's life line
         '''
-        self.stdout.write('"Async"->"%s" [label="%s", linecolor="%s"];\n' % (self.objList[objId], msgStr, self.COLOR[color]))
+        self._Write('"Async"->"%s" [label="%s", linecolor="%s"];\n' % (self.objList[objId], msgStr, self.COLOR[color]))
 
     def State(self, objId, stateStr, color=MSC_COLOR_NONE):
         ''' Displays a state change in an object's life line
         '''
         color = color if (color != MSC_COLOR_NONE) else MSC_COLOR_WHT
-        self.stdout.write('"%s" rbox "%s" [label="%s", textbgcolor="%s"];\n' % (self.objList[objId], self.objList[objId], stateStr, self.COLOR[color]))
+        self._Write('"%s" rbox "%s" [label="%s", textbgcolor="%s"];\n' % (self.objList[objId], self.objList[objId], stateStr, self.COLOR[color]))
 
     def Create(self, srcId, dstId, msgStr, color=MSC_COLOR_NONE):
         ''' Displays a message line from the src to created object's life line
@@ -195,22 +391,44 @@ class DispMscgen(Disp):
 
     def TestPt(self, objId, msgStr, color=MSC_COLOR_NONE):
         color = color if (color != MSC_COLOR_NONE) else MSC_COLOR_WHT
-        self.stdout.write('"%s" note "%s" [label="%s", textbgcolor="%s"];\n' % (self.objList[objId], self.objList[objId], msgStr, self.COLOR[color]))
+        self._Write('"%s" note "%s" [label="%s", textbgcolor="%s"];\n' % (self.objList[objId], self.objList[objId], msgStr, self.COLOR[color]))
+
+    def Skipped(self, count, critical=0):
+        ''' Displays a delay marker for the skipped records
+        '''
+        self._Write('... [label="%s"];\n' % self._SkipStr(count, critical))
 
 
-class DispWeb(Disp):
+class DispWeb(DispPaged):
     ''' Class providing API for displaying in https://www.websequencediagrams.com/
     '''
-    def __init__(self, linesPerPage=LINES_PER_PAGE, prefix="", stdout=None):
+    # A diagram has no delimiter, so pages in one input would merge
+    STREAM_PAGES = False
+
+    def __init__(self, linesPerPage=LINES_PER_PAGE, prefix="", stdout=None, maxLines=0, fileName=None):
         ''' Initialize the display
         linesPerPage[in] - Sets the number of rows before printing a new banner
         prefix[in] - Prefix String or callable function to generate prefix string
         stdout[in] - Can be overwritten to a file or stdout
+        maxLines[in] - Maximum lines per diagram page (0: single unbounded diagram)
+        fileName[in] - Page file name pattern taking the page number (i.e. "msc_%03d.wsd"),
+            required with maxLines
         '''
-        self.stdout = stdout if stdout is not None else sys.stdout
+        self._InitPages(maxLines, fileName, stdout)
         self.objList = []
         self.objCnt = len(self.objList)
 
+    def _Header(self, isCont):
+        header = "title Page %d%s\n" % (self.page, " (continued from page %d)" % (self.page - 1) if isCont else "")
+        for obj in self.objList:
+            header += 'participant "%s"\n' % obj
+        return header
+
+    def _Footer(self, isCont):
+        if isCont and self.objList:
+            return 'note over "%s":continued on page %d\n' % (self.objList[0], self.page + 1)
+        return ""
+
     def SetObjList(self, objList):
         '''
         '''
@@ -220,30 +438,36 @@ class DispWeb(Disp):
     def Message(self, srcId, dstId, msgStr, color=MSC_COLOR_NONE):
         ''' Displays a message line from the src to dst object's life line
         '''
-        self.stdout.write('"%s"->"%s":%s\n' % (self.objList[srcId], self.objList[dstId], msgStr))
+        self._Write('"%s"->"%s":%s\n' % (self.objList[srcId], self.objList[dstId], msgStr))
 
     def Event(self, objId, msgStr, color=MSC_COLOR_NONE):
         ''' Displays a asynchronous event to an object's life line
         '''
-        self.stdout.write('[-->"%s":%s\n' % (self.objList[objId], msgStr))
+        self._Write('[-->"%s":%s\n' % (self.objList[objId], msgStr))
 
     def State(self, objId, stateStr, color=MSC_COLOR_NONE):
         ''' Displays a state change in an object's life line
         '''
-        self.stdout.write('state over "%s":%s\n' % (self.objList[objId], stateStr))
+        self._Write('state over "%s":%s\n' % (self.objList[objId], stateStr))
 
     def Create(self, srcId, dstId, msgStr, color=MSC_COLOR_NONE):
         ''' Displays a message line from the src to created object's life line
         '''
-        self.stdout.write('"%s"->*"%s":%s\n' % (self.objList[srcId], self.objList[dstId], msgStr))
+        self._Write('"%s"->*"%s":%s\n' % (self.objList[srcId], self.objList[dstId], msgStr))
 
     def Destroy(self, objId, color=MSC_COLOR_NONE):
         ''' Displays a destroy of an object's life line
         '''
-        self.stdout.write('destroy "%s"\n' % self.objList[objId])
+        self._Write('destroy "%s"\n' % self.objList[objId])
 
     def TestPt(self, objId, msgStr, color=MSC_COLOR_NONE):
-        self.stdout.write('note over "%s":%s\n' % (self.objList[objId], msgStr))
+        self._Write('note over "%s":%s\n' % (self.objList[objId], msgStr))
+
+    def Skipped(self, count, critical=0):
+        ''' Displays a note for the skipped records
+        '''
+        if self.objList:
+            self._Write('note over "%s":%s\n' % (self.objList[0], self._SkipStr(count, critical)))
 
 
 class DispTerm(Disp):
@@ -489,6 +713,706 @@ class DispTerm(Disp):
         # Step 3: Output the string
         self.stdout.write(self._GetPrefix() + line + "-[ %s0x%x%s ]\n" % (DispTerm.COLOR[color][0], value, DispTerm.COLOR[color][1]))
 
+    def Skipped(self, count, critical=0):
+        ''' Displays a break across the life lines for the skipped records
+        '''
+        width = len(self.TILES["CEN"]) * max(self.objCnt, 1)
+        line = (" %s " % self._SkipStr(count, critical)).center(width, "~")
+        color = MSC_COLOR_RED if critical else MSC_COLOR_YEL
+        self.stdout.write(self._GetPrefix() + DispTerm.COLOR[color][0] + line + DispTerm.COLOR[color][1] + "\n")
+
+
+class QuantileSketch(object):
+    ''' Mergeable quantile sketch with bounded memory
+    Values are counted in logarithmic buckets so every quantile is within the
+    relative accuracy (alpha) of the true value.  When more than maxBuckets are
+    in use the lowest buckets are collapsed, which keeps the upper quantiles exact.
+    '''
+    def __init__(self, alpha=0.01, maxBuckets=1024, minValue=1e-9):
+        ''' Initialize the sketch
+        alpha[in] - Relative accuracy of the returned quantiles
+        maxBuckets[in] - Maximum number of buckets kept in memory
+        minValue[in] - Values below this are counted as zero
+        '''
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.logGamma = math.log(self.gamma)
+        self.maxBuckets = maxBuckets
+        self.minValue = minValue
+        self.buckets = {}
+        self.zeroCnt = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def _Collapse(self):
+        ''' Private Function to merge the lowest buckets until within maxBuckets
+        '''
+        if len(self.buckets) <= self.maxBuckets:
+            return
+        keys = sorted(self.buckets)
+        excess = len(keys) - self.maxBuckets
+        target = keys[excess]
+        for key in keys[0:excess]:
+            self.buckets[target] += self.buckets.pop(key)
+
+    def Add(self, value, count=1):
+        ''' Adds a value to the sketch
+        '''
+        if value > self.minValue:
+            key = int(math.ceil(math.log(value) / self.logGamma))
+            self.buckets[key] = self.buckets.get(key, 0) + count
+            if len(self.buckets) > self.maxBuckets:
+                self._Collapse()
+        else:
+            self.zeroCnt += count
+        self.count += count
+        self.total += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def Merge(self, other):
+        ''' Merges another sketch (i.e. from another capture or process) into this one
+        '''
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self._Collapse()
+        self.zeroCnt += other.zeroCnt
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+        return self
+
+    def Quantile(self, q):
+        ''' Returns the estimated value at quantile q (0.0 - 1.0) or None when empty
+        '''
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeroCnt
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                # Return the bucket's midpoint, clamped to the observed range
+                value = 2 * self.gamma ** key / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def Mean(self):
+        ''' Returns the mean value or None when empty
+        '''
+        return self.total / self.count if self.count else None
+
+
+class DispStats(Disp):
+    ''' Class providing API for collecting message statistics instead of a chart
+    All aggregates are counters and QuantileSketches, so memory is bounded by the
+    number of distinct messages and object pairs, not by the length of the capture.
+    Records are counted from Record(), which MSC.Parse() calls with the raw priority,
+    opcode and message id, so alerts and per id rates don't depend on the chart.
+    '''
+    QUANTILES = (0.5, 0.9, 0.99)
+    # Record type names indexed by MSC.HDR_TYPE_*
+    REC_TYPE = ["Message", "Event", "State", "TestPt", "Destroy", "Ack"]
+
+    def __init__(self, period=0, clock=None, stdout=None, alpha=0.01):
+        ''' Initialize the display
+        period[in] - Seconds between periodic summaries (0 disables them)
+        clock[in] - Callable returning the current time in seconds (default: time.time)
+        stdout[in] - Can be overwritten to a file or stdout
+        alpha[in] - Relative accuracy of the inter-arrival percentiles
+        '''
+        self.period = period
+        self.clock = clock if clock is not None else time.time
+        self.stdout = stdout if stdout is not None else sys.stdout
+        self.alpha = alpha
+        self.objList = []
+        self.objCnt = len(self.objList)
+        self.recCnt = 0
+        self.alertCnt = 0
+        self.skipCnt = 0
+        self.critLostCnt = 0
+        self.typeCnt = {}     # Record type -> count
+        self.msgCnt = {}      # (Record type, message id) -> count
+        self.msgName = {}     # (Record type, message id) -> message string, for display only
+        self.pairCnt = {}     # (src, dst) -> count
+        self.arrival = {}     # (Record type, message id) -> QuantileSketch of inter-arrival times
+        self.arrivalAll = QuantileSketch(alpha)
+        self.lastTick = {}    # (Record type, message id) -> last arrival time
+        self.lastTickAll = None
+        self.lastKey = None
+        self.startTick = None
+        self.endTick = None
+        self.summaryTick = None
+
+    def __getstate__(self):
+        ''' Drops the output stream and clock so the aggregates can be pickled to another process
+        '''
+        state = self.__dict__.copy()
+        del state["stdout"]
+        del state["clock"]
+        return state
+
+    def __setstate__(self, state):
+        ''' Restores the aggregates with the default output stream and clock
+        '''
+        self.__dict__.update(state)
+        self.stdout = sys.stdout
+        self.clock = time.time
+
+    def _Pair(self, srcId, dstId):
+        ''' Private Function to count the src->dst object pair
+        '''
+        pair = (self.objList[srcId], self.objList[dstId])
+        self.pairCnt[pair] = self.pairCnt.get(pair, 0) + 1
+
+    def _Name(self, msgStr):
+        ''' Private Function to remember the display string of the last recorded message id
+        '''
+        if self.lastKey is not None and self.lastKey not in self.msgName:
+            self.msgName[self.lastKey] = msgStr
+
+    def _FmtQuantiles(self, sketch):
+        ''' Private Function to format the percentiles of a sketch
+        '''
+        return " ".join("p%g=%.6f" % (q * 100, sketch.Quantile(q)) for q in self.QUANTILES)
+
+    def Record(self, ucPri, ucOpc, msgId):
+        ''' Counts a single record
+        '''
+        tick = self.clock()
+        if self.startTick is None:
+            self.startTick = tick
+            self.summaryTick = tick
+        self.endTick = tick
+        self.recCnt += 1
+        recType = self.REC_TYPE[ucOpc] if ucOpc < len(self.REC_TYPE) else "Opc(%d)" % ucOpc
+        self.typeCnt[recType] = self.typeCnt.get(recType, 0) + 1
+        if ucPri & MSC.HDR_PRI_ALT:
+            self.alertCnt += 1
+        if msgId is not None:
+            key = (recType, msgId)
+            self.msgCnt[key] = self.msgCnt.get(key, 0) + 1
+            last = self.lastTick.get(key)
+            if last is not None:
+                sketch = self.arrival.get(key)
+                if sketch is None:
+                    sketch = self.arrival[key] = QuantileSketch(self.alpha)
+                sketch.Add(tick - last)
+            self.lastTick[key] = tick
+            self.lastKey = key
+        else:
+            self.lastKey = None
+        if self.lastTickAll is not None:
+            self.arrivalAll.Add(tick - self.lastTickAll)
+        self.lastTickAll = tick
+        # Emit the periodic summary
+        if self.period and tick - self.summaryTick >= self.period:
+            self.summaryTick = tick
+            self.Summary()
+
+    def Elapsed(self):
+        ''' Returns the seconds between the first and last record
+        '''
+        if self.startTick is None:
+            return 0.0
+        return self.endTick - self.startTick
+
+    def Rate(self, count):
+        ''' Returns the count as a rate per second over the elapsed time
+        '''
+        elapsed = self.Elapsed()
+        return count / elapsed if elapsed > 0 else 0.0
+
+    def Merge(self, other):
+        ''' Merges the statistics of another DispStats (i.e. from another capture or process)
+        A DispStats can be pickled to send it from another process
+        '''
+        self.recCnt += other.recCnt
+        self.alertCnt += other.alertCnt
+        self.skipCnt += other.skipCnt
+        self.critLostCnt += other.critLostCnt
+        for dst, src in ((self.typeCnt, other.typeCnt), (self.msgCnt, other.msgCnt), (self.pairCnt, other.pairCnt)):
+            for key, count in src.items():
+                dst[key] = dst.get(key, 0) + count
+        for key, msgStr in other.msgName.items():
+            self.msgName.setdefault(key, msgStr)
+        for key, sketch in other.arrival.items():
+            if key in self.arrival:
+                self.arrival[key].Merge(sketch)
+            else:
+                self.arrival[key] = QuantileSketch(self.alpha).Merge(sketch)
+        self.arrivalAll.Merge(other.arrivalAll)
+        if other.startTick is not None:
+            self.startTick = other.startTick if self.startTick is None else min(self.startTick, other.startTick)
+            self.endTick = other.endTick if self.endTick is None else max(self.endTick, other.endTick)
+        return self
+
+    def Summary(self):
+        ''' Displays a summary of the statistics collected so far
+        '''
+        elapsed = self.Elapsed()
+        out = "----MSC Statistics: %d records in %.3fs (%.1f/s), %d alerts (%.1f/s), %d skipped (%d critical lost)----\n" % (
+            self.recCnt, elapsed, self.Rate(self.recCnt), self.alertCnt, self.Rate(self.alertCnt), self.skipCnt, self.critLostCnt)
+        for recType in sorted(self.typeCnt):
+            out += "  %-8s %10d\n" % (recType, self.typeCnt[recType])
+        if self.arrivalAll.count:
+            out += "  Inter-arrival: %s\n" % self._FmtQuantiles(self.arrivalAll)
+        for key in sorted(self.msgCnt):
+            count = self.msgCnt[key]
+            out += "  [%s 0x%04x %s] %d (%.1f/s)" % (key[0], key[1], self.msgName.get(key, ""), count, self.Rate(count))
+            if key in self.arrival:
+                out += " %s" % self._FmtQuantiles(self.arrival[key])
+            out += "\n"
+        for pair in sorted(self.pairCnt):
+            count = self.pairCnt[pair]
+            out += "  %s -> %s: %d (%.1f/s)\n" % (pair[0], pair[1], count, self.Rate(count))
+        self.stdout.write(out)
+
+    def Close(self):
+        ''' Displays the final summary when periodic summaries are enabled
+        '''
+        if self.period:
+            self.Summary()
+
+    def SetObjList(self, objList):
+        ''' Set the object list used to name the src->dst pairs
+        '''
+        self.objList = objList
+        self.objCnt = len(self.objList)
+
+    def Message(self, srcId, dstId, msgStr, color=MSC_COLOR_NONE):
+        ''' Counts the src to dst object pair of a message
+        '''
+        self._Pair(srcId, dstId)
+        self._Name(msgStr)
+
+    def Event(self, objId, msgStr, color=MSC_COLOR_NONE):
+        self._Name(msgStr)
+
+    def State(self, objId, stateStr, color=MSC_COLOR_NONE):
+        self._Name(stateStr)
+
+    def Create(self, srcId, dstId, msgStr, color=MSC_COLOR_NONE):
+        ''' Counts the src to created object pair
+        '''
+        self._Pair(srcId, dstId)
+
+    def Destroy(self, objId, color=MSC_COLOR_NONE):
+        pass
+
+    def TestPt(self, objId, value, color=MSC_COLOR_NONE):
+        pass
+
+    def Skipped(self, count, critical=0):
+        ''' Counts the records that were skipped
+        '''
+        self.skipCnt += count
+        self.critLostCnt += critical
+
+
+class DispMux(Disp):
+    ''' Class providing API for driving several displays from a single MSC decode
+    Each call is forwarded in order to every display in dispList.  Wrap slow
+    displays (i.e. file renderers) in a DispWorker so they don't stall the others.
+    '''
+    def __init__(self, dispList):
+        ''' Initialize the display
+        dispList[in] - List of displays to drive
+        '''
+        self.dispList = list(dispList)
+
+    def SetMaxStrMsgLen(self, width):
+        for disp in self.dispList:
+            disp.SetMaxStrMsgLen(width)
+
+    def SetObjList(self, objList):
+        for disp in self.dispList:
+            disp.SetObjList(objList)
+
+    def Banner(self, isRequired=False):
+        for disp in self.dispList:
+            disp.Banner(isRequired)
+
+    def Close(self):
+        for disp in self.dispList:
+            disp.Close()
+
+    def Record(self, ucPri, ucOpc, msgId):
+        for disp in self.dispList:
+            disp.Record(ucPri, ucOpc, msgId)
+
+    def Message(self, srcId, dstId, msgStr, color=MSC_COLOR_NONE):
+        for disp in self.dispList:
+            disp.Message(srcId, dstId, msgStr, color)
+
+    def Event(self, objId, msgStr, color=MSC_COLOR_NONE):
+        for disp in self.dispList:
+            disp.Event(objId, msgStr, color)
+
+    def State(self, objId, stateStr, color=MSC_COLOR_NONE):
+        for disp in self.dispList:
+            disp.State(objId, stateStr, color)
+
+    def Create(self, srcId, dstId, msgStr, color=MSC_COLOR_NONE):
+        for disp in self.dispList:
+            disp.Create(srcId, dstId, msgStr, color)
+
+    def Destroy(self, objId, color=MSC_COLOR_NONE):
+        for disp in self.dispList:
+            disp.Destroy(objId, color)
+
+    def TestPt(self, objId, value, color=MSC_COLOR_NONE):
+        for disp in self.dispList:
+            disp.TestPt(objId, value, color)
+
+    def Skipped(self, count, critical=0):
+        for disp in self.dispList:
+            disp.Skipped(count, critical)
+
+
+class DispWorker(Disp):
+    ''' Class providing API for running a display in its own worker thread
+    Calls are queued and replayed in order on the wrapped display, so a slow
+    display only delays itself.  Close() must be called to drain the queue.
+    The caller never blocks: once maxSize calls are queued further records are
+    dropped, counted in dropCnt and shown on the wrapped display with Skipped().
+    The decision is made once per record at its first call (Banner or Record)
+    and applies to all of its calls up to the display call (Message, Destroy...).
+    Object list changes are always queued so the wrapped display stays consistent.
+    '''
+    def __init__(self, disp, maxSize=10000):
+        ''' Initialize the display
+        disp[in] - Display to run in the worker thread
+        maxSize[in] - Maximum queued calls before records are dropped
+        '''
+        self.disp = disp
+        self.maxSize = maxSize
+        self.queue = queue.Queue()
+        self.dropCnt = 0        # Records dropped in total
+        self.skipped = 0        # Records dropped (or skipped upstream) since the last marker
+        self.critSkipped = 0
+        self.isDrop = None      # Drop decision of the record in progress (None: no record)
+        self.hasRecord = False  # Record() was called for the record in progress
+        self.error = None
+        self.thread = threading.Thread(target=self._Run, name="DispWorker(%s)" % disp.__class__.__name__)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _Run(self):
+        ''' Private Function to replay the queued calls on the wrapped display
+        '''
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            if self.error is None:
+                try:
+                    getattr(self.disp, item[0])(*item[1])
+                except Exception as e:
+                    # Keep draining so the caller never blocks, report on Close()
+                    self.error = e
+
+    def _Put(self, name, *args):
+        ''' Private Function to queue a call for the worker thread
+        '''
+        self.queue.put((name, args))
+
+    def _Begin(self):
+        ''' Private Function to decide whether the record in progress is dropped
+        '''
+        if self.isDrop is None:
+            self.isDrop = self.queue.qsize() >= self.maxSize
+            if not self.isDrop and self.skipped:
+                self._Put("Skipped", self.skipped, self.critSkipped)
+                self.skipped = 0
+                self.critSkipped = 0
+
+    def _End(self):
+        ''' Private Function to finish the record in progress
+        '''
+        if self.isDrop:
+            self.dropCnt += 1
+            self.skipped += 1
+        self.isDrop = None
+        self.hasRecord = False
+
+    def _PutRecord(self, name, *args):
+        ''' Private Function to queue a call of the record in progress unless it is dropped
+        '''
+        self._Begin()
+        if not self.isDrop:
+            self.queue.put((name, args))
+
+    def _PutEnd(self, name, *args):
+        ''' Private Function to queue the display call that completes the record
+        '''
+        self._PutRecord(name, *args)
+        self._End()
+
+    def SetMaxStrMsgLen(self, width):
+        self._Put("SetMaxStrMsgLen", width)
+
+    def SetObjList(self, objList):
+        self._Put("SetObjList", objList)
+
+    def Banner(self, isRequired=False):
+        self._PutRecord("Banner", isRequired)
+
+    def Close(self):
+        ''' Waits for the queued calls to finish, then closes the wrapped display
+        '''
+        if self.thread.is_alive():
+            if self.hasRecord:
+                self._End()
+            if self.skipped:
+                self._Put("Skipped", self.skipped, self.critSkipped)
+                self.skipped = 0
+                self.critSkipped = 0
+            self.queue.put(None)
+            self.thread.join()
+            self.disp.Close()
+        if self.error is not None:
+            raise self.error
+
+    def Record(self, ucPri, ucOpc, msgId):
+        if self.hasRecord:
+            # The previous record had no display call (i.e. shed by MSCGovernor)
+            self._End()
+        self._PutRecord("Record", ucPri, ucOpc, msgId)
+        self.hasRecord = True
+
+    def Message(self, srcId, dstId, msgStr, color=MSC_COLOR_NONE):
+        self._PutEnd("Message", srcId, dstId, msgStr, color)
+
+    def Event(self, objId, msgStr, color=MSC_COLOR_NONE):
+        self._PutEnd("Event", objId, msgStr, color)
+
+    def State(self, objId, stateStr, color=MSC_COLOR_NONE):
+        self._PutEnd("State", objId, stateStr, color)
+
+    def Create(self, srcId, dstId, msgStr, color=MSC_COLOR_NONE):
+        self._PutEnd("Create", srcId, dstId, msgStr, color)
+
+    def Destroy(self, objId, color=MSC_COLOR_NONE):
+        self._PutEnd("Destroy", objId, color)
+
+    def TestPt(self, objId, value, color=MSC_COLOR_NONE):
+        self._PutEnd("TestPt", objId, value, color)
+
+    def Skipped(self, count, critical=0):
+        # Combined with the records dropped here into a single marker
+        self.skipped += count
+        self.critSkipped += critical
+
+
+class DispNull(Disp):
+    ''' Class providing API that discards everything (i.e. for replaying without a chart)
+    '''
+    def SetObjList(self, objList):
+        pass
+
+    def Message(self, srcId, dstId, msgStr, color=MSC_COLOR_NONE):
+        pass
+
+    def Event(self, objId, msgStr, color=MSC_COLOR_NONE):
+        pass
+
+    def State(self, objId, stateStr, color=MSC_COLOR_NONE):
+        pass
+
+    def Create(self, srcId, dstId, msgStr, color=MSC_COLOR_NONE):
+        pass
+
+    def Destroy(self, objId, color=MSC_COLOR_NONE):
+        pass
+
+    def TestPt(self, objId, value, color=MSC_COLOR_NONE):
+        pass
+
+
+class MSCRing(object):
+    ''' Single producer / single consumer ring buffer of MSC packets in shared memory
+    The producer (i.e. a simulator in another process) calls Write() and the
+    consumer drains batches with Read() or MSC.ParseRing().  Packets are stored
+    as-is since [HDR][Len] already delimits them.  A full ring never overwrites
+    unread packets, the new packet is dropped and counted instead (see Overruns()).
+    The last reserve bytes are kept for critical packets (HDR_PRI_ALT, HDR_PRI_SOS,
+    destroys and packets that introduce an object), so under sustained overload
+    low priority packets are dropped first; critical losses are counted separately.
+
+    Uses multiprocessing.shared_memory when available, otherwise an mmap of
+    /dev/shm/<name>, which is the same POSIX shared memory object on Linux.
+
+    Layout: [Magic(4)][Capacity(4)][Head(8)][Tail(8)][Dropped(8)][CritDropped(8)][Data(Capacity)]
+        Head and the drop counters are only written by the producer, Tail only by the consumer
+    '''
+    MAGIC = 0x5243534d  # "MSCR"
+    HDR_FMT = "<LLQQQQ"
+    HDR_LEN = struct.calcsize(HDR_FMT)
+    HEAD_OFS = 8
+    TAIL_OFS = 16
+    DROP_OFS = 24
+    CRIT_OFS = 32
+
+    def __init__(self, name, capacity=1 << 20, create=False, reserve=None):
+        ''' Opens (or creates) the ring buffer
+        name[in] - Name of the shared memory object
+        capacity[in] - Size of the data area in bytes, only used when creating
+        create[in] - True to create the ring (normally the producer), False to attach
+        reserve[in] - Producer: bytes kept free for critical packets (default: capacity / 8)
+        '''
+        self.name = name
+        self.isOwner = create
+        self.shm = None
+        self.mm = None
+        size = self.HDR_LEN + capacity
+        if shared_memory is not None:
+            if create:
+                self.shm = shared_memory.SharedMemory(name, True, size)
+            else:
+                # Only the creator may unlink, so keep the resource tracker out of attachments
+                try:
+                    self.shm = shared_memory.SharedMemory(name, track=False)
+                except TypeError:
+                    # Python < 3.13 always tracks, which would unlink the ring when we exit
+                    self.shm = shared_memory.SharedMemory(name)
+                    resource_tracker.unregister(self.shm._name, "shared_memory")
+            self.buf = self.shm.buf
+        else:
+            path = os.path.join("/dev/shm", name)
+            fd = os.open(path, os.O_RDWR | (os.O_CREAT | os.O_EXCL if create else 0), 0o600)
+            try:
+                if create:
+                    os.ftruncate(fd, size)
+                else:
+                    size = os.fstat(fd).st_size
+                self.mm = mmap.mmap(fd, size)
+            finally:
+                os.close(fd)
+            self.buf = self.mm
+        if create:
+            struct.pack_into(self.HDR_FMT, self.buf, 0, self.MAGIC, capacity, 0, 0, 0, 0)
+        magic, self.capacity = struct.unpack_from("<LL", self.buf, 0)
+        if magic != self.MAGIC:
+            raise ValueError("%s is not an MSC ring buffer" % name)
+        self.reserve = reserve if reserve is not None else self.capacity // 8
+        self.objSet = set()     # Producer: object keys written so far
+        self.lastDropped = self._Get(self.DROP_OFS)
+        self.lastCritDropped = self._Get(self.CRIT_OFS)
+
+    def _Get(self, ofs):
+        ''' Private Function to read a header index
+        '''
+        return struct.unpack_from("<Q", self.buf, ofs)[0]
+
+    def _Set(self, ofs, value):
+        ''' Private Function to publish a header index
+        '''
+        struct.pack_into("<Q", self.buf, ofs, value)
+
+    def _Copy(self, idx, size):
+        ''' Private Function to copy size bytes out of the data area at idx
+        '''
+        pos = self.HDR_LEN + idx % self.capacity
+        end = self.HDR_LEN + self.capacity
+        if pos + size <= end:
+            return bytes(self.buf[pos:pos + size])
+        split = end - pos
+        return bytes(self.buf[pos:end]) + bytes(self.buf[self.HDR_LEN:self.HDR_LEN + size - split])
+
+    def Write(self, pkt):
+        ''' Producer: Adds a packet, returns False when the ring is full and the packet was dropped
+        '''
+        size = len(pkt)
+        # The consumer relies on [Len] to find the next packet, so it must match
+        if size < 2 or size != 2 + struct.unpack_from("<B", pkt, 1)[0]:
+            raise ValueError("Malformed MSC packet (%d bytes)" % size)
+        ucPri, ucOpc, keyList = MSC.Unpack(pkt)
+        isCritical = bool(ucPri & MSCGovernor.CRITICAL_PRI) or ucOpc == MSC.HDR_TYPE_DES or not self.objSet.issuperset(keyList)
+        head = self._Get(self.HEAD_OFS)
+        free = self.capacity - (head - self._Get(self.TAIL_OFS))
+        if free < size or (not isCritical and free - size < self.reserve):
+            self._Set(self.DROP_OFS, self._Get(self.DROP_OFS) + 1)
+            if isCritical:
+                self._Set(self.CRIT_OFS, self._Get(self.CRIT_OFS) + 1)
+            return False
+        if ucOpc == MSC.HDR_TYPE_DES:
+            self.objSet.difference_update(keyList)
+        else:
+            self.objSet.update(keyList)
+        pos = self.HDR_LEN + head % self.capacity
+        end = self.HDR_LEN + self.capacity
+        if pos + size <= end:
+            self.buf[pos:pos + size] = pkt
+        else:
+            split = end - pos
+            self.buf[pos:end] = pkt[0:split]
+            self.buf[self.HDR_LEN:self.HDR_LEN + size - split] = pkt[split:]
+        #NOTE: The packet must be stored before the head is published
+        self._Set(self.HEAD_OFS, head + size)
+        return True
+
+    def Read(self, maxCnt=0):
+        ''' Consumer: Drains up to maxCnt packets (0: all pending) and returns them as a list
+        '''
+        head = self._Get(self.HEAD_OFS)
+        tail = self._Get(self.TAIL_OFS)
+        if head - tail > self.capacity:
+            raise ValueError("%s ring buffer is corrupt (head=%d, tail=%d)" % (self.name, head, tail))
+        pkts = []
+        while tail < head and (maxCnt == 0 or len(pkts) < maxCnt):
+            # [HDR(1)][Len(1)][Body(Len)]
+            size = 2 + struct.unpack("<B", self._Copy(tail + 1, 1))[0]
+            pkts.append(self._Copy(tail, size))
+            tail += size
+        # Release the whole batch to the producer at once
+        self._Set(self.TAIL_OFS, tail)
+        return pkts
+
+    def Pending(self):
+        ''' Returns the number of bytes waiting to be read
+        '''
+        return self._Get(self.HEAD_OFS) - self._Get(self.TAIL_OFS)
+
+    def Overruns(self):
+        ''' Consumer: Returns the number of packets dropped since the last call
+        '''
+        dropped = self._Get(self.DROP_OFS)
+        count = dropped - self.lastDropped
+        self.lastDropped = dropped
+        return count
+
+    def CriticalOverruns(self):
+        ''' Consumer: Returns the number of critical packets dropped since the last call
+        These are also included in Overruns()
+        '''
+        dropped = self._Get(self.CRIT_OFS)
+        count = dropped - self.lastCritDropped
+        self.lastCritDropped = dropped
+        return count
+
+    def Close(self):
+        ''' Detaches from the ring buffer, the creator also removes it
+        '''
+        self.buf = None
+        if self.shm is not None:
+            self.shm.close()
+            if self.isOwner:
+                self.shm.unlink()
+        else:
+            self.mm.close()
+            if self.isOwner:
+                os.unlink(os.path.join("/dev/shm", self.name))
+
 
 class MSC(object):
     '''
@@ -587,10 +1511,14 @@ class MSC(object):
         self.objList = []
         self.filterList = []
         self.maxStrMsgLen = 0
+        # Registry version and snapshot shared by checkpoints until a register changes it
+        self.regVer = 0
+        self.regSnap = None
 
     def RegisterMsg(self, usMsgId, strMsg):
         ''' Register the msgId with message string '''
         self.msgDict[usMsgId] = strMsg
+        self.regVer += 1
         strMsgLen = len(strMsg)
         if (strMsgLen > self.maxStrMsgLen):
             self.maxStrMsgLen = strMsgLen
@@ -600,6 +1528,7 @@ class MSC(object):
         ''' Register the module Id with module string '''
         # Limit max length of string for formating
         self.modDict[ucModId] = strMod[0:MAX_NAME_LEN]
+        self.regVer += 1
 
     def AddFilter(self, ucFilterType, ucPri, ucOpc, msgId, srcMod, srcId):
         filterObj = (ucFilterType, ucPri, ucOpc, msgId, srcMod, srcId)
@@ -630,6 +1559,20 @@ class MSC(object):
         # print binascii.hexlify(pkt)
         return pkt
 
+    @staticmethod
+    def Unpack(pkt):
+        ''' Returns the (ucPri, ucOpc, keyList) of a packet without displaying it
+        keyList holds the object keys referenced by the packet
+        '''
+        hdr = ord(pkt[0:1])
+        ucPri = (hdr >> MSC.HDR_PRI_SHF) & MSC.HDR_PRI_MSK
+        ucOpc = hdr & MSC.HDR_OPC_MSK
+        if ucOpc == MSC.HDR_TYPE_MSG:
+            keyList = [pkt[2:4], pkt[4:6]]
+        else:
+            keyList = [pkt[2:4]]
+        return ucPri, ucOpc, keyList
+
     def AddObj(self, keyList):
         ''' Adds object(s) to MSC and assign it a position
         '''
@@ -641,11 +1584,8 @@ class MSC(object):
                 self.objList.append(key)
                 isChanged = True
         if isChanged:
-            objList = []
-            for key in self.objList:
-               objList.append("%x:%s" % (ord(key[0]), self.modDict.get(ord(key[1]), "UNK(%d)" % ord(key[1]))))
             # Set display's object list
-            self.disp.SetObjList(objList)
+            self.disp.SetObjList(self._ObjNames())
         return isChanged
 
     def DelObj(self, key):
@@ -658,10 +1598,38 @@ class MSC(object):
             for idx, key in enumerate(self.objList):
                 self.objDict[key] = idx
             # Set display's object list
-            objList = []
-            for key in self.objList:
-               objList.append("%x:%s" % (ord(key[0]), self.modDict.get(ord(key[1]), "UNK(%d)" % ord(key[1]))))
-            self.disp.SetObjList(objList)
+            self.disp.SetObjList(self._ObjNames())
+
+    def _ObjNames(self):
+        ''' Private Function to return the display names of the objList
+        '''
+        objList = []
+        for key in self.objList:
+           objList.append("%x:%s" % (ord(key[0:1]), self.modDict.get(ord(key[1:2]), "UNK(%d)" % ord(key[1:2]))))
+        return objList
+
+    def Checkpoint(self):
+        ''' Returns a compact snapshot of the object registry and module/message dictionaries
+        The dictionaries are only copied when they changed since the last checkpoint
+        '''
+        if self.regSnap is None or self.regSnap[0] != self.regVer:
+            self.regSnap = (self.regVer, dict(self.modDict), dict(self.msgDict))
+        return (tuple(self.objList), self.regSnap, self.maxStrMsgLen)
+
+    def Restore(self, checkpoint):
+        ''' Restores a snapshot from Checkpoint() and refreshes the display's object list
+        '''
+        objList, regSnap, maxStrMsgLen = checkpoint
+        self.regVer, modDict, msgDict = regSnap
+        self.regSnap = regSnap
+        self.modDict = dict(modDict)
+        self.msgDict = dict(msgDict)
+        self.objList = list(objList)
+        self.objDict = dict((key, idx) for idx, key in enumerate(self.objList))
+        self.maxStrMsgLen = maxStrMsgLen
+        if maxStrMsgLen:
+            self.disp.SetMaxStrMsgLen(maxStrMsgLen)
+        self.disp.SetObjList(self._ObjNames())
 
     def Parse(self, pkt):
         ''' Parses the incoming MSC protocol packet then displays
@@ -692,6 +1660,7 @@ class MSC(object):
             self.disp.Banner()
             # Display Message
             msg = struct.unpack("<H", msg)[0]
+            self.disp.Record(ucPri, ucOpc, msg)
             self.disp.Message(self.objDict[src], self.objDict[dst], self.msgDict.get(msg, MSC.DEFAULT_MESSAGE % msg), color)
         elif ucOpc == MSC.HDR_TYPE_EVT:
             # [HDR(2)][SrcObj(2)][Message(2)]
@@ -703,6 +1672,7 @@ class MSC(object):
             self.disp.Banner()
             # Display Event
             msg = struct.unpack("<H", msg)[0]
+            self.disp.Record(ucPri, ucOpc, msg)
             self.disp.Event(self.objDict[src], self.msgDict.get(msg, MSC.DEFAULT_MESSAGE % msg), color)
         elif ucOpc == MSC.HDR_TYPE_STA:
             # [HDR(2)][SrcObj(2)][State(2)]
@@ -714,11 +1684,13 @@ class MSC(object):
             self.disp.Banner()
             # Display State
             msg = struct.unpack("<H", msg)[0]
+            self.disp.Record(ucPri, ucOpc, msg)
             self.disp.State(self.objDict[src], self.msgDict.get(msg, MSC.DEFAULT_MESSAGE % msg), color)
         elif ucOpc == MSC.HDR_TYPE_TP:
             # [HDR(2)][SrcObj(2)][Value(4)]
             src = pkt[2:4]
             value = pkt[4:]
+            self.disp.Record(ucPri, ucOpc, None)
             # Display Value
             if src in self.objDict:
                 value = struct.unpack("<L", value)[0]
@@ -728,6 +1700,7 @@ class MSC(object):
         elif ucOpc == MSC.HDR_TYPE_DES:
             # [HDR(2)][SrcObj(2)]
             src = pkt[2:4]
+            self.disp.Record(ucPri, ucOpc, None)
             if src in self.objDict:
                 self.disp.Destroy(self.objDict[src], color)
                 self.DelObj(src)
@@ -736,6 +1709,326 @@ class MSC(object):
             else:
                 print("unknown src:", src)
 
+    def ParseRing(self, ring, maxCnt=0):
+        ''' Drains a batch of up to maxCnt packets (0: all pending) from an MSCRing and parses them
+        Returns the number of packets parsed
+        '''
+        lost = ring.Overruns()
+        critical = ring.CriticalOverruns()
+        if lost:
+            # Show the packets lost to overruns in the chart
+            self.disp.Skipped(lost, critical)
+        pkts = ring.Read(maxCnt)
+        for pkt in pkts:
+            self.Parse(pkt)
+        return len(pkts)
+
+
+class MSCGovernor(object):
+    ''' Live mode governor that sheds low priority records when the parser falls behind
+    Once the backlog reaches highWater, records are dropped until it falls back to
+    lowWater, except for HDR_PRI_ALT alerts, HDR_PRI_SOS sequence starts, destroys
+    and records that create an object, so the chart and lifelines stay correct.
+    Shed records are still counted (per opcode), passed to the display's Record()
+    so its counters stay complete, and the display shows a marker
+    with the number of records skipped before the next one that is kept.
+    With ParseRing() the MSCRing producer already drops low priority packets first
+    when the ring is full; those overruns are added to the marker, and critical
+    ones lost there are counted and shown separately.
+    '''
+    CRITICAL_PRI = MSC.HDR_PRI_ALT | MSC.HDR_PRI_SOS
+
+    def __init__(self, msc, highWater, lowWater=None):
+        ''' Initialize the governor
+        msc[in] - MSC instance that parses the kept records
+        highWater[in] - Backlog at which shedding starts (i.e. bytes pending in an MSCRing)
+        lowWater[in] - Backlog at which shedding stops (default: highWater / 2)
+        '''
+        self.msc = msc
+        self.highWater = highWater
+        self.lowWater = lowWater if lowWater is not None else highWater // 2
+        self.isShedding = False
+        self.skipped = 0    # Records skipped since the last marker
+        self.shedCnt = {}   # Opcode -> records shed
+        self.lostCnt = 0    # Records lost to MSCRing overruns
+        self.critLostCnt = 0    # Critical records lost to MSCRing overruns
+        self.critSkipped = 0    # Critical records lost since the last marker
+
+    def IsCritical(self, pkt):
+        ''' Returns True if the record must never be shed
+        '''
+        ucPri, ucOpc, keyList = MSC.Unpack(pkt)
+        if (ucPri & self.CRITICAL_PRI) or ucOpc == MSC.HDR_TYPE_DES:
+            return True
+        # Records that introduce an object create its life line
+        for key in keyList:
+            if key not in self.msc.objDict:
+                return True
+        return False
+
+    def Parse(self, pkt, backlog):
+        ''' Parses the packet unless it is shed, returns True if it was parsed
+        backlog[in] - Current backlog in the same units as highWater/lowWater
+        '''
+        if backlog >= self.highWater:
+            self.isShedding = True
+        elif backlog <= self.lowWater:
+            self.isShedding = False
+        if self.isShedding and not self.IsCritical(pkt):
+            ucPri, ucOpc, keyList = MSC.Unpack(pkt)
+            self.shedCnt[ucOpc] = self.shedCnt.get(ucOpc, 0) + 1
+            self.skipped += 1
+            # Keep the display's counters (i.e. DispStats) complete, only the chart skips it
+            if ucOpc == MSC.HDR_TYPE_MSG:
+                msgId = struct.unpack("<H", pkt[6:8])[0]
+            elif ucOpc in (MSC.HDR_TYPE_EVT, MSC.HDR_TYPE_STA):
+                msgId = struct.unpack("<H", pkt[4:6])[0]
+            else:
+                msgId = None
+            self.msc.disp.Record(ucPri, ucOpc, msgId)
+            return False
+        self.Flush()
+        self.msc.Parse(pkt)
+        return True
+
+    def ParseRing(self, ring, maxCnt=0):
+        ''' Drains a batch of up to maxCnt packets (0: all pending) from an MSCRing
+        The backlog is the number of bytes still pending in the ring and the batch
+        Returns the number of packets parsed
+        '''
+        lost = ring.Overruns()
+        critical = ring.CriticalOverruns()
+        self.lostCnt += lost
+        self.critLostCnt += critical
+        self.skipped += lost
+        self.critSkipped += critical
+        pkts = ring.Read(maxCnt)
+        backlog = ring.Pending() + sum(len(pkt) for pkt in pkts)
+        count = 0
+        for pkt in pkts:
+            backlog -= len(pkt)
+            if self.Parse(pkt, backlog):
+                count += 1
+        return count
+
+    def Flush(self):
+        ''' Displays the marker for any records skipped since the last one
+        '''
+        if self.skipped:
+            self.msc.disp.Skipped(self.skipped, self.critSkipped)
+            self.skipped = 0
+            self.critSkipped = 0
+
+    def ShedTotal(self):
+        ''' Returns the total number of records shed
+        '''
+        return sum(self.shedCnt.values())
+
+
+class MSCCheckpoints(object):
+    ''' Periodic checkpoints of the MSC object registry for rendering any window of a trace
+    Build() takes a checkpoint every interval records during a first pass.  Render()
+    then restores the nearest checkpoint at or before the window and replays at
+    most interval records without a chart, so the cost is proportional to the window.
+    '''
+    def __init__(self, interval=1000):
+        ''' Initialize the checkpoints
+        interval[in] - Number of records between checkpoints
+        '''
+        self.interval = interval
+        self.idxList = []   # Record index of each checkpoint (sorted)
+        self.cpList = []    # Checkpoint taken before parsing the record at idxList[n]
+
+    def Record(self, msc, idx):
+        ''' Takes a checkpoint if record idx is on an interval, call before parsing it
+        '''
+        if idx % self.interval == 0:
+            self.idxList.append(idx)
+            self.cpList.append(msc.Checkpoint())
+
+    def Build(self, msc, pkts):
+        ''' Runs the first pass over pkts starting from msc's current registry
+        msc is left untouched, the pass uses its own MSC without a chart
+        '''
+        shadow = MSC(DispNull())
+        shadow.Restore(msc.Checkpoint())
+        del self.idxList[:]
+        del self.cpList[:]
+        for idx, pkt in enumerate(pkts):
+            self.Record(shadow, idx)
+            shadow.Parse(pkt)
+
+    def Nearest(self, idx):
+        ''' Returns the (index, checkpoint) nearest at or before record idx
+        '''
+        pos = bisect.bisect_right(self.idxList, idx) - 1
+        if pos < 0:
+            raise ValueError("No checkpoint at or before record %d" % idx)
+        return self.idxList[pos], self.cpList[pos]
+
+    def Render(self, msc, pkts, start, end):
+        ''' Displays records [start, end) of pkts on msc's display with the exact lifelines
+        '''
+        cpIdx, checkpoint = self.Nearest(start)
+        # Step 1: Replay from the checkpoint up to the window without a chart
+        disp = msc.disp
+        msc.disp = DispNull()
+        try:
+            msc.Restore(checkpoint)
+            for pkt in pkts[cpIdx:start]:
+                msc.Parse(pkt)
+        finally:
+            msc.disp = disp
+        # Step 2: Push the restored lifelines to the display and render the window
+        msc.Restore(msc.Checkpoint())
+        for pkt in pkts[start:end]:
+            msc.Parse(pkt)
+
+
+class MSCSequence(object):
+    ''' A message sequence started by an HDR_PRI_SOS record and followed by HDR_PRI_SEQ records
+    '''
+    def __init__(self, seqId, idx, tick, keyList):
+        self.seqId = seqId
+        self.recList = [idx]        # Record indices in the trace
+        self.objSet = set(keyList)  # Object keys taking part in the sequence
+        self.startTick = tick
+        self.endTick = tick
+        self.isEvicted = False
+
+    def Add(self, idx, tick, keyList):
+        ''' Appends a follow-on record to the sequence
+        '''
+        self.recList.append(idx)
+        self.objSet.update(keyList)
+        self.endTick = tick
+
+    def Length(self):
+        ''' Returns the number of records in the sequence
+        '''
+        return len(self.recList)
+
+    def Span(self):
+        ''' Returns the time between the first and last record
+        '''
+        return self.endTick - self.startTick
+
+
+class MSCTransactions(object):
+    ''' Online builder that groups records into sequences from the SOS/SEQ priority markers
+    An HDR_PRI_SOS record opens a sequence and an HDR_PRI_SEQ record joins the most
+    recently active open sequence that shares one of its objects.  At most maxOpen
+    sequences are kept open, each up to maxLen records; a sequence idle for more than
+    maxIdle records, or evicted to make room, is moved to the index of completed ones.
+    '''
+    def __init__(self, maxOpen=64, maxIdle=1000, maxLen=1000, clock=None):
+        ''' Initialize the builder
+        maxOpen[in] - Maximum number of open sequences
+        maxIdle[in] - Records without activity before an open sequence is completed
+        maxLen[in] - Maximum records in a sequence before it is completed
+        clock[in] - Callable returning the current time in seconds (default: time.time)
+        '''
+        self.maxOpen = maxOpen
+        self.maxIdle = maxIdle
+        self.maxLen = maxLen
+        self.clock = clock if clock is not None else time.time
+        self.openDict = collections.OrderedDict()   # seqId -> MSCSequence, least recently active first
+        self.lastIdx = {}       # seqId -> index of the last record
+        self.index = []         # Completed sequences
+        self.seqCnt = 0
+        self.recIdx = 0
+        self.orphanCnt = 0      # HDR_PRI_SEQ records without an open sequence
+        self.evictCnt = 0
+
+    def _Complete(self, seqId):
+        ''' Private Function to move an open sequence to the index
+        '''
+        self.lastIdx.pop(seqId)
+        self.index.append(self.openDict.pop(seqId))
+
+    def _Expire(self, idx):
+        ''' Private Function to complete the stale open sequences
+        '''
+        while self.openDict:
+            seqId = next(iter(self.openDict))
+            if idx - self.lastIdx[seqId] <= self.maxIdle:
+                break
+            self._Complete(seqId)
+
+    def Feed(self, pkt, idx=None, tick=None):
+        ''' Adds a record to the sequences, returns its MSCSequence or None
+        idx[in] - Index of the record in the trace (default: count of records fed)
+        tick[in] - Time of the record (default: clock())
+        '''
+        if idx is None:
+            idx = self.recIdx
+        self.recIdx = idx + 1
+        self._Expire(idx)
+        ucPri, ucOpc, keyList = MSC.Unpack(pkt)
+        if not ucPri & (MSC.HDR_PRI_SOS | MSC.HDR_PRI_SEQ):
+            return None
+        tick = tick if tick is not None else self.clock()
+        if ucPri & MSC.HDR_PRI_SOS:
+            seq = MSCSequence(self.seqCnt, idx, tick, keyList)
+            self.seqCnt += 1
+            if len(self.openDict) >= self.maxOpen:
+                # Evict the least recently active sequence
+                self.openDict[next(iter(self.openDict))].isEvicted = True
+                self._Complete(next(iter(self.openDict)))
+                self.evictCnt += 1
+        else:
+            # Join the most recently active sequence sharing an object
+            seq = None
+            for seqId in reversed(self.openDict):
+                if not self.openDict[seqId].objSet.isdisjoint(keyList):
+                    seq = self.openDict.pop(seqId)
+                    break
+            if seq is None:
+                self.orphanCnt += 1
+                return None
+            seq.Add(idx, tick, keyList)
+        # Mark as most recently active
+        self.openDict[seq.seqId] = seq
+        self.lastIdx[seq.seqId] = idx
+        if seq.Length() >= self.maxLen:
+            self._Complete(seq.seqId)
+        return seq
+
+    def Flush(self):
+        ''' Completes all open sequences (i.e. at the end of a capture)
+        '''
+        while self.openDict:
+            self._Complete(next(iter(self.openDict)))
+
+    def Longest(self, n):
+        ''' Returns the n completed sequences with the most records
+        '''
+        return heapq.nlargest(n, self.index, key=MSCSequence.Length)
+
+    def Slowest(self, n):
+        ''' Returns the n completed sequences with the longest time span
+        '''
+        return heapq.nlargest(n, self.index, key=MSCSequence.Span)
+
+    def Render(self, seqList, pkts, dispFactory, msc):
+        ''' Displays just the records of each sequence, each on its own display and lifelines
+        pkts[in] - The trace the record indices refer to
+        dispFactory[in] - Callable taking the MSCSequence and returning a new display for it
+            (i.e. lambda seq: DispPlantUML(stdout=open("seq_%d.puml" % seq.seqId, "w")))
+        msc[in] - MSC holding the module and message dictionaries
+        '''
+        for seq in seqList:
+            disp = dispFactory(seq)
+            view = MSC(disp)
+            view.modDict = dict(msc.modDict)
+            view.msgDict = dict(msc.msgDict)
+            view.maxStrMsgLen = msc.maxStrMsgLen
+            if msc.maxStrMsgLen:
+                disp.SetMaxStrMsgLen(msc.maxStrMsgLen)
+            for idx in seq.recList:
+                view.Parse(pkts[idx])
+            disp.Close()
+
 
 import datetime
 def stamp():
@@ -815,5 +2108,81 @@ def main():
             msc.Parse(pkt)
         print("----Packet Parse Test (%s) [End]----\n" % disp.__class__.__name__)
 
+    # Collect statistics without drawing a chart
+    stats = DispStats()
+    msc = MSC(stats)
+    msc.RegisterMod(0, "ModA")
+    msc.RegisterMod(1, "ModB")
+    msc.RegisterMod(2, "ModC")
+    for pkt in pkts:
+        msc.Parse(pkt)
+    stats.Summary()
+
+    # Parse once and render to several displays, file renderers in worker threads
+    print("----Fan-out Test [Start]----")
+    webOut = StringIO()
+    umlOut = StringIO()
+    mux = DispMux([DispTerm(20, stamp), DispWorker(DispWeb(stdout=webOut)), DispWorker(DispPlantUML(stdout=umlOut))])
+    msc = MSC(mux)
+    msc.RegisterMod(0, "ModA")
+    msc.RegisterMod(1, "ModB")
+    msc.RegisterMod(2, "ModC")
+    for pkt in pkts:
+        msc.Parse(pkt)
+    mux.Close()
+    print("  DispWeb")
+    sys.stdout.write(webOut.getvalue())
+    print("  DispPlantUML")
+    sys.stdout.write(umlOut.getvalue())
+    print("----Fan-out Test [End]----\n")
+
+    # Ingest through a shared memory ring buffer as a local producer would
+    print("----Ring Buffer Test [Start]----")
+    ring = MSCRing("msc_demo_%d" % os.getpid(), 64, create=True)
+    msc = MSC(DispTerm(20, stamp))
+    msc.RegisterMod(0, "ModA")
+    msc.RegisterMod(1, "ModB")
+    msc.RegisterMod(2, "ModC")
+    for pkt in pkts:
+        if ring.capacity - ring.reserve - ring.Pending() < len(pkt):
+            # Ring is full for low priority packets, let the consumer catch up
+            msc.ParseRing(ring)
+        ring.Write(pkt)
+    msc.ParseRing(ring)
+    ring.Close()
+    print("----Ring Buffer Test [End]----\n")
+
+    # Shed low priority records while the backlog is above the high water mark
+    print("----Governor Test [Start]----")
+    msc = MSC(DispTerm(20, stamp))
+    msc.RegisterMod(0, "ModA")
+    msc.RegisterMod(1, "ModB")
+    msc.RegisterMod(2, "ModC")
+    gov = MSCGovernor(msc, highWater=8, lowWater=2)
+    for idx, pkt in enumerate(pkts):
+        gov.Parse(pkt, len(pkts) - idx)
+    gov.Flush()
+    print("----Governor Test [End] shed %d----\n" % gov.ShedTotal())
+
+    # Render a window from the middle of the trace using checkpoints
+    print("----Checkpoint Test [Start]----")
+    msc = MSC(DispTerm(20, stamp))
+    msc.RegisterMod(0, "ModA")
+    msc.RegisterMod(1, "ModB")
+    msc.RegisterMod(2, "ModC")
+    checkpoints = MSCCheckpoints(4)
+    checkpoints.Build(msc, pkts)
+    checkpoints.Render(msc, pkts, 9, 12)
+    print("----Checkpoint Test [End]----\n")
+
+    # Group records into sequences and render only the longest one
+    print("----Transaction Test [Start]----")
+    txn = MSCTransactions()
+    for pkt in pkts:
+        txn.Feed(pkt)
+    txn.Flush()
+    txn.Render(txn.Longest(2), pkts, lambda seq: DispTerm(20, stamp), msc)
+    print("----Transaction Test [End]----\n")
+
 if __name__ == "__main__":
     main()